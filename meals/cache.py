@@ -0,0 +1,15 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+# The progress page only changes when a meal is eaten, swapped or regenerated,
+# so its numbers are kept for a while and dropped whenever that happens.
+PROGRESS_CACHE_TIMEOUT = 60 * 15
+
+
+def progress_cache_key(user_id, day=None):
+    day = day or timezone.now().date()
+    return f'progress:{user_id}:{day.isoformat()}'
+
+
+def invalidate_progress(user_id):
+    cache.delete(progress_cache_key(user_id))
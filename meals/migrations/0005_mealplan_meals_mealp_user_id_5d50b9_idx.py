@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-14 08:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0004_remove_mealplan_date_created_mealplan_spoonacular_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', 'eaten', 'eaten_at'], name='meals_mealp_user_id_5d50b9_idx'),
+        ),
+    ]
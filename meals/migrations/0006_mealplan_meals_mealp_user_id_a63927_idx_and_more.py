@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-14 08:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0005_mealplan_meals_mealp_user_id_5d50b9_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', 'day'], name='meals_mealp_user_id_a63927_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', 'spoonacular_id'], name='meals_mealp_user_id_6dae78_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-14 08:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_slots(apps, schema_editor):
+    """
+    Keep only the most recent meal for each (user, day, meal_type) slot so the
+    unique constraint can be added.
+    """
+    MealPlan = apps.get_model('meals', 'MealPlan')
+    duplicates = (
+        MealPlan.objects.values('user', 'day', 'meal_type')
+        .annotate(n=Count('id'), keep=Max('id'))
+        .filter(n__gt=1)
+    )
+    for slot in duplicates:
+        MealPlan.objects.filter(
+            user=slot['user'], day=slot['day'], meal_type=slot['meal_type']
+        ).exclude(id=slot['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0006_mealplan_meals_mealp_user_id_a63927_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='mealplan',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'meal_type'), name='uniq_user_day_mealtype'),
+        ),
+        migrations.RemoveIndex(
+            model_name='mealplan',
+            name='meals_mealp_user_id_a63927_idx',
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-14 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0007_mealplan_uniq_user_day_mealtype'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredients',
+            fields=[
+                ('spoonacular_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('ingredients', models.JSONField(default=list)),
+            ],
+        ),
+    ]
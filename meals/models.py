@@ -1,6 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+DAYS_OF_WEEK = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+DAY_BY_LOWER = {day.lower(): day for day in DAYS_OF_WEEK}
+
+MEAL_TYPES = ('Breakfast', 'Lunch', 'Dinner')
+
 class MealPlan(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     day = models.CharField(max_length=10)
@@ -20,5 +25,29 @@ class MealPlan(models.Model):
     eaten = models.BooleanField(default=False)
     eaten_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        # List views load rows with only(); carbs, fats and eaten_at are rarely
+        # needed there and are the first candidates to leave deferred.
+        indexes = [
+            models.Index(fields=['user', 'eaten', 'eaten_at']),
+            models.Index(fields=['user', 'spoonacular_id']),
+        ]
+        # The unique (user, day, meal_type) index also serves (user, day) lookups
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'meal_type'], name='uniq_user_day_mealtype'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s {self.meal_type} on {self.day}"
+
+
+class RecipeIngredients(models.Model):
+    """
+    Ingredient names for a Spoonacular recipe. A recipe's ingredients never
+    change, so they're stored once and reused by the grocery list.
+    """
+    spoonacular_id = models.PositiveIntegerField(primary_key=True)
+    ingredients = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"Ingredients for recipe {self.spoonacular_id}"
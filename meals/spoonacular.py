@@ -0,0 +1,154 @@
+import hashlib
+import json
+import time
+import orjson
+import pybreaker
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Spoonacular data for a given request doesn't change from one day to the next.
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# One pooled session per process so connections to the API are kept alive
+# and reused. Transient errors and 429s are retried with a short backoff;
+# a 429's Retry-After is ignored so a throttled call can't park a web worker
+# for as long as the server asks.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=False,
+    ),
+))
+
+
+def _is_client_error(exc):
+    """
+    A 4xx other than quota (402) or rate limit (429) errors means the request
+    itself was bad, not that the API is struggling.
+    """
+    if not isinstance(exc, requests.exceptions.HTTPError) or exc.response is None:
+        return False
+    status = exc.response.status_code
+    return 400 <= status < 500 and status not in (402, 429)
+
+
+# After repeated failures, stop calling the API for a minute and fail fast
+# instead of tying up workers on requests that are going to time out.
+_BREAKER = pybreaker.CircuitBreaker(fail_max=5, reset_timeout=60, exclude=[_is_client_error])
+
+
+@_BREAKER
+def _get(url, params):
+    response = _SESSION.get(url, params=params, timeout=(3.05, 10))
+    response.raise_for_status()
+    return response
+
+
+def _within_rate_limit():
+    """
+    Counts calls per second in the shared cache so all workers together stay
+    under SPOONACULAR_RATE_LIMIT. If the cache is unavailable, the call is let through.
+    """
+    key = f'spoon:rate:{int(time.time())}'
+    cache.add(key, 0, timeout=2)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        return True
+    return count is None or count <= settings.SPOONACULAR_RATE_LIMIT
+
+
+def _cache_key(endpoint, params):
+    """
+    Builds a cache key from the endpoint and its params, so identical requests
+    (e.g. users with the same diet and intolerances) share one cache entry.
+    """
+    raw = endpoint + json.dumps(params, sort_keys=True, default=str)
+    return 'spoon:' + hashlib.blake2b(raw.encode()).hexdigest()
+
+
+def fetch_from_spoonacular(endpoint, params=None, use_cache=True):
+    """
+    A helper function to make requests to the Spoonacular API.
+    Successful responses are cached for a day unless use_cache is False,
+    which randomized endpoints like mealplanner/generate need. Returns None
+    on any failure, including when the rate limit is hit or the circuit
+    breaker is open.
+    """
+    params = dict(params or {})
+    key = _cache_key(endpoint, params)
+    if use_cache:
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    params['apiKey'] = settings.SPOONACULAR_API_KEY
+    base_url = "https://api.spoonacular.com/"
+    url = f"{base_url}{endpoint}"
+
+    if not _within_rate_limit():
+        print(f"API request skipped: rate limit reached for {endpoint}")
+        return None
+
+    try:
+        response = _get(url, params)
+        data = orjson.loads(response.content)
+    except pybreaker.CircuitBreakerError:
+        print(f"API request skipped: circuit open for {endpoint}")
+        return None
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+        print(f"API request failed: {e}")
+        return None
+
+    if use_cache:
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
+
+
+# Health flag -> Spoonacular diet, checked in order; the first match wins.
+# Diabetes comes first: it's a medical constraint, the rest are preferences.
+DIETS = (
+    ('diabetes', 'low glycemic'),
+    ('vegan', 'vegan'),
+    ('vegetarian', 'vegetarian'),
+    ('gluten', 'gluten free'),
+)
+
+# Health flag -> Spoonacular intolerance
+INTOLERANCES = {
+    'gluten': 'gluten',
+    'dairy': 'dairy',
+    'lactose': 'dairy',
+}
+
+
+def diet_for(profile):
+    """
+    Picks the Spoonacular diet for a profile's health issues, or None.
+    """
+    flags = profile.health_flags
+    return next((diet for flag, diet in DIETS if flag in flags), None)
+
+
+def intolerances_for(profile):
+    """
+    Lists the Spoonacular intolerances for a profile's health issues.
+    """
+    flags = profile.health_flags
+    return sorted({intolerance for flag, intolerance in INTOLERANCES.items() if flag in flags})
+
+
+def nutrient_map(recipe):
+    """
+    Maps nutrient name to amount for a recipe fetched with addRecipeNutrition,
+    so each nutrient is a dict lookup rather than a scan over the list.
+    """
+    return {n['name']: n['amount'] for n in recipe.get('nutrition', {}).get('nutrients', [])}
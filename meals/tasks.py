@@ -0,0 +1,76 @@
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
+from users.models import Profile
+from .cache import invalidate_progress
+from .models import DAY_BY_LOWER, MEAL_TYPES, MealPlan
+from .spoonacular import diet_for, fetch_from_spoonacular
+
+
+@shared_task
+def generate_meal_plan_task(user_id):
+    """
+    Generates a 7-day meal plan based on the user's profile and goal.
+    Returns True once the new plan is saved, False if the API gave us nothing.
+    """
+    profile = Profile.objects.select_related('user').get(user_id=user_id)
+    tdee = profile.calculate_tdee()
+
+    if profile.goal == 'lose':
+        calorie_target = tdee - 500
+    elif profile.goal == 'gain':
+        calorie_target = tdee + 500
+    else:
+        calorie_target = tdee
+
+    response_data = fetch_from_spoonacular(
+        'mealplanner/generate',
+        params={
+            'timeFrame': 'week',
+            'targetCalories': calorie_target,
+            'diet': diet_for(profile),
+        },
+        # Every call returns a fresh random plan, so a cached one would make
+        # "Regenerate Plan" return the same week all day.
+        use_cache=False,
+    )
+
+    if not response_data or not response_data.get('week'):
+        return False
+
+    meals = []
+    for day, data in response_data['week'].items():
+        for i, meal_data in enumerate(data['meals']):
+            meals.append(MealPlan(
+                user=profile.user,
+                day=DAY_BY_LOWER.get(day.lower(), day.capitalize()),
+                meal_type=MEAL_TYPES[i] if i < len(MEAL_TYPES) else f'Meal {i + 1}',
+                meal_name=meal_data.get('title', 'Generated Meal'),
+                spoonacular_id=meal_data['id'],
+                calories=meal_data.get('calories', 0),
+                protein=meal_data.get('protein', '0g'),
+                fats=meal_data.get('fat', '0g'), # Corrected from fat to fats
+                carbs=meal_data.get('carbohydrates', '0g'),
+                image_url=f"https://spoonacular.com/recipeImages/{meal_data['id']}-556x370.{meal_data.get('imageType', 'jpg')}",
+            ))
+
+    if not meals:
+        return False
+
+    new_slots = Q()
+    for meal in meals:
+        new_slots |= Q(day=meal.day, meal_type=meal.meal_type)
+
+    # Overwrite each (day, meal_type) slot in place, and drop whatever the old
+    # plan had outside those slots (legacy rows, snacks added from Discover).
+    with transaction.atomic():
+        MealPlan.objects.filter(user=profile.user).exclude(new_slots).delete()
+        MealPlan.objects.bulk_create(
+            meals,
+            batch_size=100,
+            update_conflicts=True,
+            unique_fields=['user', 'day', 'meal_type'],
+            update_fields=['meal_name', 'spoonacular_id', 'calories', 'protein', 'carbs', 'fats', 'image_url', 'eaten', 'eaten_at'],
+        )
+    invalidate_progress(user_id)
+    return True
@@ -1,3 +1,216 @@
-from django.test import TestCase
+from unittest import mock
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 
+from users.models import Profile
+from .models import MealPlan
+from .spoonacular import _SESSION, diet_for, fetch_from_spoonacular, intolerances_for
+from .tasks import generate_meal_plan_task
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_user(username='alice', health_issues=''):
+    user = User.objects.create_user(username, password='pw')
+    Profile.objects.create(
+        user=user, age=30, weight=70, height=175, gender='male',
+        activity_level='light', health_issues=health_issues, goal='maintain',
+    )
+    return user
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MealPlanStatusTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def generate(self):
+        task = mock.Mock(id='task-1')
+        with mock.patch('meals.views.generate_meal_plan_task.delay', return_value=task):
+            return self.client.get(reverse('generate_meal_plan'))
+
+    def status(self, task_id='task-1', **result):
+        async_result = mock.Mock(**result)
+        with mock.patch('meals.views.AsyncResult', return_value=async_result):
+            return self.client.get(reverse('meal_plan_status', args=[task_id]))
+
+    def test_pending_task_reports_not_done(self):
+        self.generate()
+        response = self.status(state='PENDING', **{'ready.return_value': False, 'successful.return_value': False})
+        self.assertEqual(response.json()['done'], False)
+        self.assertEqual(self.client.session['meal_plan_task_id'], 'task-1')
+
+    def test_revoked_task_is_done(self):
+        self.generate()
+        response = self.status(state='REVOKED', **{'ready.return_value': True, 'successful.return_value': False})
+        self.assertEqual(response.json(), {'state': 'REVOKED', 'done': True, 'success': False})
+        self.assertNotIn('meal_plan_task_id', self.client.session)
+
+    def test_poll_after_the_task_finished_reports_unknown(self):
+        self.generate()
+        finished = {'ready.return_value': True, 'successful.return_value': True}
+        self.assertTrue(self.status(state='SUCCESS', **finished).json()['success'])
+        response = self.status(state='SUCCESS', **finished)
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(response.json()['unknown'])
+
+    def test_other_users_task_is_not_found(self):
+        self.generate()
+        self.client.force_login(make_user('bob'))
+        response = self.status(state='SUCCESS', **{'ready.return_value': True, 'successful.return_value': True})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, SPOONACULAR_RATE_LIMIT=100)
+class FetchFromSpoonacularTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def fetch(self, endpoint, **kwargs):
+        response = mock.Mock(content=b'{"ok": true}')
+        with mock.patch('meals.spoonacular._SESSION.get', return_value=response) as get:
+            fetch_from_spoonacular(endpoint, {'a': 1}, **kwargs)
+            fetch_from_spoonacular(endpoint, {'a': 1}, **kwargs)
+        return get.call_count
+
+    def test_responses_are_cached(self):
+        self.assertEqual(self.fetch('recipes/informationBulk'), 1)
+
+    def test_use_cache_false_always_calls_the_api(self):
+        self.assertEqual(self.fetch('mealplanner/generate', use_cache=False), 2)
+
+    def test_retries_ignore_retry_after(self):
+        retry = _SESSION.get_adapter('https://api.spoonacular.com/').max_retries
+        self.assertFalse(retry.respect_retry_after_header)
+
+
+def fake_week(first_id=100):
+    days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+    return {'week': {
+        day: {'meals': [{'id': first_id + i * 3 + j, 'title': f'Recipe {i}{j}', 'imageType': 'jpg'} for j in range(3)]}
+        for i, day in enumerate(days)
+    }}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class GenerateMealPlanTaskTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def generate(self, week):
+        with mock.patch('meals.tasks.fetch_from_spoonacular', return_value=week):
+            return generate_meal_plan_task(self.user.id)
+
+    def test_regenerating_replaces_the_whole_plan(self):
+        # A row from before meal types were Breakfast/Lunch/Dinner, and a snack
+        # added from Discover; neither is a slot the generated plan fills.
+        MealPlan.objects.create(user=self.user, day='Monday', meal_type='Old Recipe Title',
+                                meal_name='Old Recipe Title', spoonacular_id=1, calories=100)
+        MealPlan.objects.create(user=self.user, day='Monday', meal_type='Snack',
+                                meal_name='Snack', spoonacular_id=2, calories=100)
+
+        self.assertTrue(self.generate(fake_week()))
+        self.assertTrue(self.generate(fake_week(first_id=200)))
+
+        meals = MealPlan.objects.filter(user=self.user)
+        self.assertEqual(meals.count(), 21)
+        self.assertEqual(
+            sorted(meals.filter(day='Monday').values_list('meal_type', flat=True)),
+            ['Breakfast', 'Dinner', 'Lunch'],
+        )
+        self.assertTrue(all(200 <= recipe_id < 221 for recipe_id in meals.values_list('spoonacular_id', flat=True)))
+
+    def test_empty_response_keeps_the_old_plan(self):
+        self.generate(fake_week())
+        self.assertFalse(self.generate({'week': {}}))
+        self.assertEqual(MealPlan.objects.filter(user=self.user).count(), 21)
+
+
+class RemoveDuplicateSlotsMigrationTests(TransactionTestCase):
+    migrate_from = [('meals', '0006_mealplan_meals_mealp_user_id_a63927_idx_and_more')]
+    migrate_to = [('meals', '0007_mealplan_uniq_user_day_mealtype')]
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_keeps_only_the_newest_meal_per_slot(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldMealPlan = apps.get_model('meals', 'MealPlan')
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        for name in ('First', 'Second', 'Third'):
+            OldMealPlan.objects.create(user=user, day='Monday', meal_type='Lunch', meal_name=name, calories=100)
+        OldMealPlan.objects.create(user=user, day='Monday', meal_type='Dinner', meal_name='Dinner', calories=100)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        NewMealPlan = apps.get_model('meals', 'MealPlan')
+        self.assertEqual(
+            sorted(NewMealPlan.objects.values_list('meal_type', 'meal_name')),
+            [('Dinner', 'Dinner'), ('Lunch', 'Third')],
+        )
+
+
+def search_results(*recipe_ids):
+    return {'results': [
+        {'id': recipe_id, 'title': f'Recipe {recipe_id}', 'image': f'https://img/{recipe_id}.jpg',
+         'nutrition': {'nutrients': [{'name': 'Calories', 'amount': 400.4}]}}
+        for recipe_id in recipe_ids
+    ]}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReplaceMealTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        self.meal = MealPlan.objects.create(user=self.user, day='Monday', meal_type='Lunch',
+                                            meal_name='Current', spoonacular_id=1, calories=500)
+
+    def replace(self, primary, fallback):
+        def fake_fetch(endpoint, params=None):
+            return primary if 'targetCalories' in params else fallback
+        with mock.patch('meals.views.fetch_from_spoonacular', side_effect=fake_fetch):
+            response = self.client.post(reverse('replace_meal', args=[self.meal.id]))
+        self.meal.refresh_from_db()
+        return response.json()
+
+    def test_skips_the_current_recipe_in_the_results(self):
+        data = self.replace(search_results(1, 2), search_results(3))
+        self.assertTrue(data['success'])
+        self.assertEqual(self.meal.spoonacular_id, 2)
+        self.assertEqual(self.meal.calories, 400)
+
+    def test_uses_fallback_when_primary_only_has_the_current_recipe(self):
+        data = self.replace(search_results(1), search_results(1, 3))
+        self.assertTrue(data['success'])
+        self.assertEqual(self.meal.spoonacular_id, 3)
+
+    def test_fails_when_no_different_recipe_is_found(self):
+        data = self.replace(search_results(1), None)
+        self.assertFalse(data['success'])
+        self.assertEqual(self.meal.spoonacular_id, 1)
+
+
+class DietForTests(TestCase):
+    def diet(self, health_issues):
+        return diet_for(Profile(health_issues=health_issues))
+
+    def test_diabetes_takes_precedence(self):
+        self.assertEqual(self.diet('vegan, diabetes'), 'low glycemic')
+
+    def test_negated_diet_is_ignored(self):
+        self.assertEqual(self.diet('Non-vegetarian, diabetes'), 'low glycemic')
+        self.assertIsNone(self.diet('non-vegetarian'))
+
+    def test_intolerances(self):
+        profile = Profile(health_issues='Lactose intolerant, gluten')
+        self.assertEqual(intolerances_for(profile), ['dairy', 'gluten'])
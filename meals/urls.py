@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('plan/generate/', views.generate_meal_plan, name='generate_meal_plan'),
     path('plan/', views.meal_plan_view, name='meal_plan'),
+    path('status/<str:task_id>/', views.meal_plan_status, name='meal_plan_status'),
     path('grocery/', views.grocery_list, name='grocery_list'),
     path('progress/', views.progress_view, name='progress'),
     path('meal/<int:meal_id>/replace/', views.replace_meal, name='replace_meal'),
@@ -1,181 +1,193 @@
-import requests
 import csv
-import json
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from django.conf import settings
-from django.contrib import messages 
+from itertools import groupby
+from operator import attrgetter
+from celery.result import AsyncResult
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.core.cache import cache
+from django.db.models import Case, Count, F, IntegerField, Sum, When
+from django.db.models.functions import Now, TruncDate
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
-from .models import MealPlan
-from users.models import Profile
+from .cache import PROGRESS_CACHE_TIMEOUT, invalidate_progress, progress_cache_key
+from .models import DAYS_OF_WEEK, MealPlan, RecipeIngredients
+from .spoonacular import diet_for, fetch_from_spoonacular, intolerances_for, nutrient_map
+from .tasks import generate_meal_plan_task
 
+# Session key holding the id of the user's in-flight plan generation task
+PLAN_TASK_SESSION_KEY = 'meal_plan_task_id'
 
-def _fetch_from_spoonacular(endpoint, params={}):
+# Shared pool for fanning out independent Spoonacular calls within a request.
+_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+# Sorts MealPlan rows Monday -> Sunday in the database.
+_DAY_INDEX = Case(
+    *[When(day=day, then=i) for i, day in enumerate(DAYS_OF_WEEK)],
+    output_field=IntegerField(),
+)
+
+
+class ORJsonResponse(HttpResponse):
+    """
+    A JsonResponse equivalent that serializes with orjson.
     """
-    A helper function to make requests to the Spoonacular API.
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(orjson.dumps(data), **kwargs)
+
+
+class Echo:
     """
-    params['apiKey'] = settings.SPOONACULAR_API_KEY
-    base_url = "https://api.spoonacular.com/"
-    url = f"{base_url}{endpoint}"
-    
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"API request failed: {e}")
-        return None
+    A file-like object that hands back whatever is written to it, so csv.writer
+    rows can be streamed out one at a time instead of buffered.
+    """
+    def write(self, value):
+        return value
 
 
 @login_required
 def generate_meal_plan(request):
     """
-    Generates a 7-day meal plan based on the user's profile and goal.
+    Queues generation of a 7-day meal plan and sends the user back to the
+    plan page, which polls meal_plan_status until the task has finished.
     """
-    profile = request.user.profile
-    tdee = profile.calculate_tdee()
-    
-    if profile.goal == 'lose':
-        calorie_target = tdee - 500
-    elif profile.goal == 'gain':
-        calorie_target = tdee + 500
-    else:
-        calorie_target = tdee
-
-    health_issues = profile.health_issues.lower() if profile.health_issues else ''
-    diet = 'low glycemic' if 'diabetes' in health_issues else None
-    
-    response_data = _fetch_from_spoonacular(
-        'mealplanner/generate',
-        params={
-            'timeFrame': 'week',
-            'targetCalories': calorie_target,
-            'diet': diet,
-        }
-    )
-
-    if response_data and 'week' in response_data:
-        MealPlan.objects.filter(user=request.user).delete()
-        
-        for day, data in response_data['week'].items():
-            for meal_data in data['meals']:
-                MealPlan.objects.create(
-                    user=request.user,
-                    day=day.capitalize(),
-                    meal_type=meal_data.get('title', 'Meal'),
-                    meal_name=meal_data.get('title', 'Generated Meal'),
-                    spoonacular_id=meal_data['id'],
-                    calories=meal_data.get('calories', 0),
-                    protein=meal_data.get('protein', '0g'),
-                    fats=meal_data.get('fat', '0g'), # Corrected from fat to fats
-                    carbs=meal_data.get('carbohydrates', '0g'),
-                    image_url=f"https://spoonacular.com/recipeImages/{meal_data['id']}-556x370.{meal_data.get('imageType', 'jpg')}",
-                )
-        return redirect('meal_plan')
-
-    messages.error(request, "Could not generate a meal plan. The API might be temporarily unavailable or your daily quota may have been reached.")
+    task = generate_meal_plan_task.delay(request.user.id)
+    # Remembered in the session so only this user can poll the task
+    request.session[PLAN_TASK_SESSION_KEY] = task.id
     return redirect('meal_plan')
 
 
+@login_required
+def meal_plan_status(request, task_id):
+    if task_id != request.session.get(PLAN_TASK_SESSION_KEY):
+        # Either not this user's task, or one an earlier poll (another tab, an
+        # overlapping request) already saw finish. The client just reloads the
+        # plan page, which shows whatever plan is saved.
+        return ORJsonResponse({'success': False, 'unknown': True, 'error': 'Unknown task'}, status=404)
+
+    result = AsyncResult(task_id)
+    done = result.ready()
+    if done:
+        del request.session[PLAN_TASK_SESSION_KEY]
+    return ORJsonResponse({
+        'state': result.state,
+        'done': done,
+        'success': result.successful() and bool(result.result),
+    })
+
+
 @login_required
 def meal_plan_view(request):
-    meals = MealPlan.objects.filter(user=request.user).order_by('pk')
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    
-    grouped_meals = {day: [] for day in days_order}
-    for meal in meals:
-        if meal.day in grouped_meals:
-            grouped_meals[meal.day].append(meal)
-            
-    context = {'grouped_meals': grouped_meals}
+    meals = (
+        MealPlan.objects.filter(user=request.user, day__in=DAYS_OF_WEEK)
+        .only('id', 'day', 'meal_type', 'meal_name', 'calories', 'protein', 'image_url', 'eaten')
+        .annotate(day_index=_DAY_INDEX)
+        .order_by('day_index', 'pk')
+    )
+
+    grouped_meals = {day: [] for day in DAYS_OF_WEEK}
+    for day, day_meals in groupby(meals, key=attrgetter('day')):
+        grouped_meals[day] = list(day_meals)
+
+    context = {
+        'grouped_meals': grouped_meals,
+        'pending_task_id': request.session.get(PLAN_TASK_SESSION_KEY),
+    }
     return render(request, 'meals/meal_plan.html', context)
 
 
 @login_required
 def replace_meal(request, meal_id):
     if request.method == 'POST':
-        original_meal = get_object_or_404(MealPlan, id=meal_id, user=request.user)
-        profile = request.user.profile
-        
+        original_meal = get_object_or_404(
+            MealPlan.objects.only('id', 'spoonacular_id', 'calories'),
+            id=meal_id, user=request.user,
+        )
+
+        # A few candidates per search, so there's still a different recipe to
+        # pick when the top (and cached) result is the meal being replaced.
         params = {
-            'number': 1,
+            'number': 5,
             'addRecipeNutrition': 'true',
-            'targetCalories': original_meal.calories,
         }
-        
-        response_data = _fetch_from_spoonacular('recipes/complexSearch', params=params)
-        
-        if not response_data or not response_data.get('results'):
-             # If first attempt fails, try a broader search
-            del params['targetCalories']
-            response_data = _fetch_from_spoonacular('recipes/complexSearch', params=params)
 
-        if response_data and response_data.get('results'):
-            new_recipe = response_data['results'][0]
-            
-            nutrition_data = new_recipe.get('nutrition', {}).get('nutrients', [])
-            calories = next((n['amount'] for n in nutrition_data if n['name'] == 'Calories'), original_meal.calories)
+        # Fire the broader fallback search alongside the calorie-matched one
+        # so a miss on the first doesn't cost a second round-trip.
+        primary = _EXECUTOR.submit(
+            fetch_from_spoonacular, 'recipes/complexSearch',
+            {**params, 'targetCalories': original_meal.calories},
+        )
+        fallback = _EXECUTOR.submit(fetch_from_spoonacular, 'recipes/complexSearch', params)
+
+        # The fallback is only waited on if the primary search has nothing new
+        new_recipe = next(
+            (
+                recipe
+                for search in (primary, fallback)
+                for recipe in (search.result() or {}).get('results', [])
+                if recipe['id'] != original_meal.spoonacular_id
+            ),
+            None,
+        )
+
+        if new_recipe:
+            calories = nutrient_map(new_recipe).get('Calories', original_meal.calories)
 
             original_meal.meal_name = new_recipe['title']
             original_meal.spoonacular_id = new_recipe['id']
             original_meal.calories = round(calories)
             original_meal.image_url = new_recipe.get('image')
-            original_meal.save()
+            original_meal.save(update_fields=['meal_name', 'spoonacular_id', 'calories', 'image_url'])
+            invalidate_progress(request.user.id)
             
-            return JsonResponse({
+            return ORJsonResponse({
                 'success': True,
                 'meal_name': original_meal.meal_name,
                 'calories': original_meal.calories,
                 'image_url': original_meal.image_url
             })
             
-    return JsonResponse({'success': False, 'error': 'Could not find a replacement meal. Please try again later or check your API quota.'})
+    return ORJsonResponse({'success': False, 'error': 'Could not find a replacement meal. Please try again later or check your API quota.'})
 
 
 @login_required
 def toggle_meal_eaten(request, meal_id):
     if request.method == 'POST':
-        meal = get_object_or_404(MealPlan, id=meal_id, user=request.user)
-        meal.eaten = not meal.eaten
-        if meal.eaten:
-            meal.eaten_at = timezone.now()
-        else:
-            meal.eaten_at = None
-        meal.save()
-        return JsonResponse({'success': True, 'eaten': meal.eaten})
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
+        meals = MealPlan.objects.filter(id=meal_id, user=request.user)
+        # Flip the flag in a single UPDATE; the When sees the old value
+        updated = meals.update(
+            eaten=~F('eaten'),
+            eaten_at=Case(When(eaten=False, then=Now()), default=None),
+        )
+        if not updated:
+            return ORJsonResponse({'success': False, 'error': 'Meal not found'}, status=404)
+        invalidate_progress(request.user.id)
+        return ORJsonResponse({'success': True, 'eaten': meals.values_list('eaten', flat=True).get()})
+    return ORJsonResponse({'success': False, 'error': 'Invalid request'})
 
 
 @login_required
 def discover_meals(request):
     profile = request.user.profile
-    health_issues = profile.health_issues.lower() if profile.health_issues else ''
-    
-    diet = 'low glycemic' if 'diabetes' in health_issues else None
-    intolerances = []
-    if 'gluten' in health_issues:
-        intolerances.append('gluten')
-    if 'dairy' in health_issues or 'lactose' in health_issues:
-        intolerances.append('dairy')
-
-    recipes_data = _fetch_from_spoonacular(
+
+    recipes_data = fetch_from_spoonacular(
         'recipes/complexSearch',
         params={
             'number': 12,
             'addRecipeNutrition': 'true',
             'cuisine': 'Indian',
-            'diet': diet,
-            'intolerances': ','.join(intolerances)
+            'diet': diet_for(profile),
+            'intolerances': ','.join(intolerances_for(profile))
         }
     )
 
     recipes = []
     if recipes_data and 'results' in recipes_data:
         for recipe in recipes_data['results']:
-            nutrition = recipe.get('nutrition', {}).get('nutrients', [])
-            calories = next((n['amount'] for n in nutrition if n['name'] == 'Calories'), 0)
+            calories = nutrient_map(recipe).get('Calories', 0)
             
             recipes.append({
                 'id': recipe['id'],
@@ -192,99 +204,136 @@ def discover_meals(request):
 
 @login_required
 def grocery_list(request):
-    meals = MealPlan.objects.filter(user=request.user)
-    ingredient_list = set()
-    
-    for meal in meals:
-        if not meal.spoonacular_id:
-            continue
-        ingredients_data = _fetch_from_spoonacular(f'recipes/{meal.spoonacular_id}/ingredientWidget.json')
-        if ingredients_data and 'ingredients' in ingredients_data:
-            for item in ingredients_data['ingredients']:
-                ingredient_list.add(item['name'].capitalize())
+    recipe_ids = sorted(
+        MealPlan.objects.filter(user=request.user, spoonacular_id__isnull=False)
+        .values_list('spoonacular_id', flat=True)
+        .distinct()
+    )
+
+    known = dict(
+        RecipeIngredients.objects.filter(spoonacular_id__in=recipe_ids)
+        .values_list('spoonacular_id', 'ingredients')
+    )
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in known]
+
+    if missing:
+        # Only recipes we haven't seen before need an API call
+        recipes_data = fetch_from_spoonacular(
+            'recipes/informationBulk',
+            params={'ids': ','.join(map(str, missing))}
+        ) or []
+        fetched = [
+            RecipeIngredients(
+                spoonacular_id=recipe['id'],
+                ingredients=[ingredient['name'] for ingredient in recipe.get('extendedIngredients', [])],
+            )
+            for recipe in recipes_data
+        ]
+        RecipeIngredients.objects.bulk_create(fetched, ignore_conflicts=True)
+        known.update((recipe.spoonacular_id, recipe.ingredients) for recipe in fetched)
+
+    ingredient_list = sorted({
+        name.capitalize()
+        for ingredients in known.values()
+        for name in ingredients
+    })
 
     if request.GET.get('format') == 'csv':
-        response = HttpResponse(content_type='text/csv')
+        writer = csv.writer(Echo())
+
+        def rows():
+            yield writer.writerow(['Ingredient'])
+            for item in ingredient_list:
+                yield writer.writerow([item])
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="grocery_list.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Ingredient'])
-        for item in sorted(list(ingredient_list)):
-            writer.writerow([item])
         return response
         
-    context = {'shopping_list': sorted(list(ingredient_list))}
+    context = {'shopping_list': ingredient_list}
     return render(request, 'meals/grocery_list.html', context)
 
 
-@login_required
-def progress_view(request):
+def _build_progress_context(profile, today):
     """
-    Calculates and displays the user's progress over the last 7 days,
-    including summary stats and data for charts.
+    Works out the summary stats and chart data for the 7 days up to today.
     """
-    profile = request.user.profile
-    today = timezone.now().date()
     seven_days_ago = today - timedelta(days=6)
 
-    meals_last_7_days = MealPlan.objects.filter(
-        user=request.user,
-        eaten=True,
-        eaten_at__date__gte=seven_days_ago,
-        eaten_at__date__lte=today
-    ).order_by('eaten_at__date')
-
-    daily_data = {}
-    for i in range(7):
-        day = seven_days_ago + timedelta(days=i)
-        day_str = day.strftime('%b %d')
-        daily_data[day_str] = {'calories': 0, 'meals': 0}
-
-    for meal in meals_last_7_days:
-        day_str = meal.eaten_at.strftime('%b %d')
-        if day_str in daily_data:
-            daily_data[day_str]['calories'] += meal.calories
-            daily_data[day_str]['meals'] += 1
-
-    total_calories_week = sum(d['calories'] for d in daily_data.values())
-    total_meals_week = sum(d['meals'] for d in daily_data.values())
-
-    days_tracked = len([d for d in daily_data.values() if d['calories'] > 0])
+    daily_totals = (
+        MealPlan.objects.filter(
+            user=profile.user,
+            eaten=True,
+            eaten_at__date__gte=seven_days_ago,
+            eaten_at__date__lte=today
+        )
+        .annotate(eaten_on=TruncDate('eaten_at'))
+        .values('eaten_on')
+        .annotate(calories=Sum('calories'), meals=Count('id'))
+    )
+
+    # One slot per day of the week, indexed by days since seven_days_ago
+    dates_list = [(seven_days_ago + timedelta(days=i)).strftime('%b %d') for i in range(7)]
+    calories_list = [0] * 7
+    meal_counts_list = [0] * 7
+
+    for row in daily_totals:
+        i = (row['eaten_on'] - seven_days_ago).days
+        if 0 <= i < 7:
+            calories_list[i] = row['calories']
+            meal_counts_list[i] = row['meals']
+
+    total_calories_week = sum(calories_list)
+    total_meals_week = sum(meal_counts_list)
+
+    days_tracked = sum(1 for calories in calories_list if calories > 0)
     avg_daily_calories = total_calories_week // days_tracked if days_tracked > 0 else 0
 
     tdee = profile.calculate_tdee()
     best_day = {'date': 'N/A', 'calories': 0}
-    min_diff = float('inf')
 
     if days_tracked > 0:
-        for date, data in daily_data.items():
-            if data['calories'] > 0:
-                diff = abs(data['calories'] - tdee)
-                if diff < min_diff:
-                    min_diff = diff
-                    best_day['date'] = date
-                    best_day['calories'] = data['calories']
-
-    dates_list = list(daily_data.keys())
-    calories_list = [d['calories'] for d in daily_data.values()]
-    meal_counts_list = [d['meals'] for d in daily_data.values()]
+        i = min(range(7), key=lambda i: abs(calories_list[i] - tdee) if calories_list[i] else float('inf'))
+        best_day = {'date': dates_list[i], 'calories': calories_list[i]}
 
-    context = {
+    return {
         'total_calories_week': total_calories_week,
         'total_meals_week': total_meals_week,
         'avg_daily_calories': avg_daily_calories,
         'best_day': best_day,
-        'dates_json': json.dumps(dates_list),
-        'calories_json': json.dumps(calories_list),
-        'meal_counts_json': json.dumps(meal_counts_list),
+        'dates_json': orjson.dumps(dates_list).decode(),
+        'calories_json': orjson.dumps(calories_list).decode(),
+        'meal_counts_json': orjson.dumps(meal_counts_list).decode(),
+        'daily_rows': list(zip(dates_list, calories_list, meal_counts_list)),
     }
 
+
+@login_required
+def progress_view(request):
+    """
+    Calculates and displays the user's progress over the last 7 days,
+    including summary stats and data for charts. The result is cached per
+    user per day until one of their meals changes.
+    """
+    profile = request.user.profile
+    today = timezone.now().date()
+
+    cache_key = progress_cache_key(request.user.id, today)
+    context = cache.get(cache_key)
+    if context is None:
+        context = _build_progress_context(profile, today)
+        cache.set(cache_key, context, PROGRESS_CACHE_TIMEOUT)
+
     if request.GET.get('format') == 'csv':
-        response = HttpResponse(content_type='text/csv')
+        writer = csv.writer(Echo())
+
+        def rows():
+            yield writer.writerow(['Date', 'Calories Consumed', 'Meals Eaten'])
+            for row in context['daily_rows']:
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="weekly_progress_report.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Date', 'Calories Consumed', 'Meals Eaten'])
-        for date, data in daily_data.items():
-            writer.writerow([date, data['calories'], data['meals']])
         return response
 
     return render(request, 'meals/progress.html', context)
@@ -294,18 +343,25 @@ def progress_view(request):
 def add_meal_to_plan(request):
     if request.method == 'POST':
         try:
-            data = json.loads(request.body)
-            MealPlan.objects.create(
+            data = orjson.loads(request.body)
+            # Each (day, meal_type) slot holds one meal, so adding to a filled
+            # slot replaces what was there.
+            MealPlan.objects.update_or_create(
                 user=request.user,
                 day=data['day'],
                 meal_type=data['meal_type'],
-                meal_name=data['name'],
-                spoonacular_id=data['recipe_id'],
-                calories=int(data.get('calories', 0)),
-                image_url=data.get('image')
+                defaults={
+                    'meal_name': data['name'],
+                    'spoonacular_id': data['recipe_id'],
+                    'calories': int(data.get('calories', 0)),
+                    'image_url': data.get('image'),
+                    'eaten': False,
+                    'eaten_at': None,
+                },
             )
-            return JsonResponse({'success': True})
+            invalidate_progress(request.user.id)
+            return ORJsonResponse({'success': True})
         except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-    return JsonResponse({'success': False, 'error': 'Invalid request method'})
+            return ORJsonResponse({'success': False, 'error': str(e)})
+    return ORJsonResponse({'success': False, 'error': 'Invalid request method'})
 
@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_bite.settings')
+
+app = Celery('smart_bite')
+
+# Read every CELERY_* setting from Django's settings module.
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -17,6 +17,8 @@ from decouple import config
 
 # Temporary fallback — remove after testing
 SPOONACULAR_API_KEY = config('SPOONACULAR_API_KEY', default='45aca5021fa84441828051b92ce1ee8d')  
+# Maximum Spoonacular requests per second across all workers
+SPOONACULAR_RATE_LIMIT = config('SPOONACULAR_RATE_LIMIT', default=5, cast=int)
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -106,6 +108,12 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+AUTHENTICATION_BACKENDS = [
+    'users.backends.ProfileModelBackend',
+    # Kept so sessions created before the backend above was added stay valid
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -140,6 +148,29 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache
+# Used to keep Spoonacular responses around. Redis errors are ignored so an
+# outage just means more API calls rather than failed pages.
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/2'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+}
+
+# Celery
+# Spoonacular calls run on their own queue so retries and rate limits on the
+# external API don't hold up any other background work.
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/1')
+CELERY_TASK_ROUTES = {
+    'meals.tasks.generate_meal_plan_task': {'queue': 'spoonacular'},
+}
+
 import os
 SECRET_KEY = 'your-secret-key-change-in-production'
 DEBUG = True
@@ -1,3 +1,5 @@
+import re
+from functools import cached_property
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -15,6 +17,9 @@ GOALS = [
     ('maintain', 'Maintain Weight'),
 ]
 
+# Words that negate the one after them in health_issues
+NEGATIONS = {'non', 'not'}
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     age = models.PositiveIntegerField()
@@ -54,5 +59,24 @@ class Profile(models.Model):
         # Multiply BMR by the activity multiplier to get TDEE
         return round(bmr * multipliers[self.activity_level])
 
+    @cached_property
+    def health_flags(self):
+        """
+        The words in health_issues as a lowercase set, e.g. "Gluten intolerance,
+        diabetes" -> {'gluten', 'intolerance', 'diabetes'}. A word negated by
+        "non"/"not" is left out, so "Non-vegetarian" doesn't flag vegetarian.
+        Worked out once per profile instance, so views in the same request share it.
+        """
+        flags = set()
+        negated = False
+        for word in re.findall(r'[a-z]+', (self.health_issues or '').lower()):
+            if word in NEGATIONS:
+                negated = True
+                continue
+            if not negated:
+                flags.add(word)
+            negated = False
+        return flags
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
\ No newline at end of file
@@ -1,3 +1,52 @@
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Profile
+
+
+class SignUpTests(TestCase):
+    def test_signup_logs_the_new_user_in(self):
+        response = self.client.post(reverse('signup'), {
+            'username': 'alice',
+            'email': 'alice@example.com',
+            'password1': 'a-Long-passw0rd',
+            'password2': 'a-Long-passw0rd',
+        })
+        self.assertRedirects(response, reverse('create_profile'), fetch_redirect_response=False)
+        user = User.objects.get(username='alice')
+        self.assertEqual(self.client.session[SESSION_KEY], str(user.pk))
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def login(self):
+        return self.client.post(reverse('login'), {'username': 'alice', 'password': 'pw'})
+
+    def test_login_without_profile_goes_to_create_profile(self):
+        response = self.login()
+        self.assertRedirects(response, reverse('create_profile'), fetch_redirect_response=False)
+        self.assertEqual(self.client.session[SESSION_KEY], str(self.user.pk))
+
+    def test_login_with_profile_goes_to_dashboard(self):
+        Profile.objects.create(user=self.user, age=30, weight=70, height=175, gender='male',
+                               activity_level='light', goal='maintain')
+        response = self.login()
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+
+class HealthFlagsTests(TestCase):
+    def flags(self, health_issues):
+        return Profile(health_issues=health_issues).health_flags
+
+    def test_splits_into_lowercase_words(self):
+        self.assertEqual(self.flags('Gluten intolerance, Diabetes'), {'gluten', 'intolerance', 'diabetes'})
+
+    def test_empty_health_issues(self):
+        self.assertEqual(self.flags(None), set())
+
+    def test_negated_word_is_left_out(self):
+        self.assertEqual(self.flags('Non-vegetarian, not vegan, diabetes'), {'diabetes'})
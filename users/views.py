@@ -7,6 +7,7 @@ from django.utils import timezone
 
 from .forms import SignUpForm, ProfileForm
 from .models import Profile
+from meals.cache import invalidate_progress
 from meals.models import MealPlan
 
 def home(request):
@@ -32,7 +33,9 @@ def signup(request):
         form = SignUpForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            # With more than one auth backend configured, login() needs to be
+            # told which one a freshly created user belongs to.
+            login(request, user, backend='users.backends.ProfileModelBackend')
             return redirect('create_profile')
     else:
         form = SignUpForm()
@@ -67,6 +70,8 @@ def profile_view(request):
         form = ProfileForm(request.POST, instance=profile)
         if form.is_valid():
             form.save()
+            # Best day on the progress page is measured against the TDEE
+            invalidate_progress(request.user.id)
             messages.success(request, 'Your profile has been updated successfully!')
             return redirect('profile')
     else:
@@ -115,7 +120,7 @@ def dashboard(request):
         eaten=True,
         eaten_at__gte=today_start,
         eaten_at__lt=today_end
-    )
+    ).only('calories', 'protein', 'carbs', 'fats')
     
     calories_consumed = sum(meal.calories for meal in today_meals)
     